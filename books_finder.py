@@ -3,67 +3,291 @@ import argparse
 import requests
 import sys
 import os
-from urllib.parse import quote
-import json
+import re
+import shutil
+import socket
+from urllib.parse import urlencode
+import hashlib
+import orjson
+import shelve
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as URLLib3HTTPError
+from urllib3.util import Retry
 
+# Cache DNS lookups for the lifetime of the process. The same three
+# hosts get re-resolved for every new connection (retries, downloads
+# after a search), and neither Python nor a bare resolver caches
+# getaddrinfo results; failures are not cached.
+_getaddrinfo = socket.getaddrinfo
+socket.getaddrinfo = lru_cache(maxsize=32)(_getaddrinfo)
+
+# Shared session: keep-alive connection pooling avoids a fresh TCP+TLS
+# handshake per request, and retries cover transient API hiccups.
+SESSION = requests.Session()
+_retry = Retry(total=3, backoff_factor=0.3,
+               status_forcelist=(429, 500, 502, 503, 504))
+SESSION.mount('https://', HTTPAdapter(max_retries=_retry,
+                                      pool_connections=4, pool_maxsize=10))
+SESSION.headers['User-Agent'] = 'book-finder/1.0'
+# Advertise brotli only when the decoder is installed; urllib3 then
+# decompresses 'br' bodies transparently. JSON compresses 5-10x, so
+# this directly cuts wire bytes on every API call.
+try:
+    import brotli  # noqa: F401
+    SESSION.headers['Accept-Encoding'] = 'gzip, deflate, br'
+except ImportError:
+    SESSION.headers['Accept-Encoding'] = 'gzip, deflate'
+
+# On-disk cache for the read-only JSON endpoints. Both catalogs change
+# slowly, so repeated runs with the same query can skip the network
+# entirely. Overridden by --no-cache / --cache-ttl.
+CACHE_DIR = os.path.expanduser('~/.cache/book-finder')
+CACHE_TTL = 86400
+CACHE_ENABLED = True
+_CACHE_VERSION = 'v3'
+# dbm backends don't tolerate concurrent writers, and searches run on
+# the shared executor; the lock is released while the network fetch
+# itself is in flight so requests still overlap.
+_CACHE_LOCK = threading.Lock()
+
+# One shared pool dispatches all concurrent I/O (search fan-out and
+# batch metadata lookups), so each call site doesn't pay pool setup
+# and teardown.
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='book-finder')
+
+# Sentinel returned by fetch callables when the server answers a
+# conditional GET with 304 Not Modified
+_NOT_MODIFIED = object()
+
+def cached_fetch(url, fetch):
+    """Call fetch(url, headers), serving from the on-disk cache when fresh
+
+    fetch must return (data, response_headers), or _NOT_MODIFIED when
+    the server confirms the cached copy is still current. Stale
+    entries are revalidated with If-None-Match / If-Modified-Since, so
+    an unchanged resource costs one header-only round-trip instead of
+    a full body download.
+    """
+    if not CACHE_ENABLED:
+        data, _ = fetch(url, None)
+        return data
+
+    key = hashlib.blake2b(f"{_CACHE_VERSION}:{url}".encode()).hexdigest()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(CACHE_DIR, 'api-cache')
+
+    with _CACHE_LOCK:
+        with shelve.open(cache_path) as cache:
+            entry = cache.get(key)
+    now = time.time()
+    if entry and now - entry['cached_at'] < CACHE_TTL:
+        return entry['data']
+
+    conditional = {}
+    if entry:
+        if entry.get('etag'):
+            conditional['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            conditional['If-Modified-Since'] = entry['last_modified']
+
+    result = fetch(url, conditional or None)
+    if result is _NOT_MODIFIED:
+        entry['cached_at'] = now
+        data = entry['data']
+    else:
+        data, headers = result
+        entry = {
+            'cached_at': now,
+            'data': data,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+
+    with _CACHE_LOCK:
+        with shelve.open(cache_path) as cache:
+            cache[key] = entry
+    return data
+
+def fetch_json(url):
+    """GET a JSON endpoint, parsed in full, through the on-disk cache"""
+    def fetch(url, headers):
+        response = SESSION.get(url, timeout=(5, 30), headers=headers)
+        if response.status_code == 304:
+            return _NOT_MODIFIED
+        response.raise_for_status()
+        return orjson.loads(response.content), response.headers
+    return cached_fetch(url, fetch)
+
+# The lru_cache decorators below memoize within a single run (scripted
+# flows may hit the same query or book several times); callers must
+# treat the returned objects as read-only.
+@lru_cache(maxsize=64)
 def search_project_gutenberg(title=None, author=None):
     """Search Project Gutenberg for books by title and/or author"""
-    params = []
-    if title:
-        params.append(f"search={quote(title.lower())}")
-    if author:
-        params.append(f"search={quote(author.lower())}")
-    
-    if not params:
+    if not title and not author:
         return []
-    
-    url = f"https://gutendex.com/books/?{'&'.join(params)}"
+
+    url = _gutendex_url(title, author)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        return data.get('results', [])
-    except requests.RequestException as e:
+        return cached_fetch(url, _fetch_gutenberg_results)
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
         print(f"Error searching Project Gutenberg: {e}")
         return []
 
-def search_open_library(title=None, author=None):
-    """Search Open Library for books by title and/or author"""
-    params = []
+def _fetch_gutenberg_results(url, headers):
+    """Fetch a gutendex search page, keeping only the fields we use"""
+    response = SESSION.get(url, timeout=(5, 30), headers=headers)
+    if response.status_code == 304:
+        return _NOT_MODIFIED
+    response.raise_for_status()
+    results = [_to_gutenberg_book(book)
+               for book in orjson.loads(response.content).get('results', [])]
+    return results, response.headers
+
+@dataclass(slots=True, frozen=True)
+class GutenbergBook:
+    """Slim, immutable projection of a gutendex book record"""
+    id: int
+    title: str
+    authors: tuple  # author display names, e.g. ('Austen, Jane',)
+    epub_url: str | None
+
+def _to_gutenberg_book(book):
+    """Project a raw gutendex book dict into a GutenbergBook"""
+    return GutenbergBook(
+        id=book.get('id'),
+        title=book.get('title', 'Unknown Title'),
+        authors=tuple(author['name'] for author in book.get('authors', ())),
+        epub_url=book.get('formats', {}).get('application/epub+zip'),
+    )
+
+def _gutendex_url(title, author):
+    """Build a gutendex search URL
+
+    The API takes a single 'search' parameter; title and author terms
+    are joined into one query (the old code sent two 'search' keys, of
+    which the server only honoured the last).
+    """
+    query = ' '.join(part for part in (title, author) if part).lower()
+    return 'https://gutendex.com/books/?' + urlencode({'search': query})
+
+def _openlibrary_url(title, author):
+    """Build an Open Library search URL"""
+    params = {}
     if title:
-        params.append(f"title={quote(title.lower())}")
+        params['title'] = title.lower()
     if author:
-        params.append(f"author={quote(author.lower())}")
-    
-    if not params:
+        params['author'] = author.lower()
+    return 'https://openlibrary.org/search.json?' + urlencode(params)
+
+@lru_cache(maxsize=64)
+def search_open_library(title=None, author=None):
+    """Search Open Library for books by title and/or author"""
+    if not title and not author:
         return []
-    
-    url = f"https://openlibrary.org/search.json?{'&'.join(params)}"
+
+    url = _openlibrary_url(title, author)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        return data.get('docs', [])
-    except requests.RequestException as e:
+        return cached_fetch(url, _fetch_openlibrary_docs)
+    except (requests.RequestException, URLLib3HTTPError, orjson.JSONDecodeError) as e:
         print(f"Error searching Open Library: {e}")
         return []
 
+def _fetch_openlibrary_docs(url, headers):
+    """Stream-parse an Open Library search page, stopping after 10 docs
+
+    Open Library responses run to hundreds of KB with 50+ fields per
+    doc; ijson lets us pull just the three fields we display and close
+    the response without materializing the rest. Imported here so runs
+    that never reach Open Library (cache hits, --source gutenberg,
+    --help) don't pay for loading its C backend.
+    """
+    import ijson
+
+    with SESSION.get(url, stream=True, timeout=(5, 30), headers=headers) as response:
+        if response.status_code == 304:
+            return _NOT_MODIFIED
+        response.raise_for_status()
+        response.raw.decode_content = True
+        docs = []
+        try:
+            for doc in ijson.items(response.raw, 'docs.item'):
+                docs.append({
+                    'title': doc.get('title'),
+                    'author_name': doc.get('author_name'),
+                    'first_publish_year': doc.get('first_publish_year'),
+                })
+                if len(docs) >= 10:
+                    break
+        except ijson.JSONError as e:
+            # Truncated or non-JSON body; surface it the way requests
+            # reports a broken stream so callers catch one family
+            raise requests.exceptions.ContentDecodingError(str(e)) from e
+        return docs, response.headers
+
+DOWNLOADS_DIR = 'downloads'
+_downloads_dir_ready = False
+FORCE_DOWNLOAD = False  # set by --force
+
+def _ensure_downloads_dir():
+    """Create the downloads directory once per process"""
+    global _downloads_dir_ready
+    if not _downloads_dir_ready:
+        os.makedirs(DOWNLOADS_DIR, exist_ok=True)
+        _downloads_dir_ready = True
+
 def download_epub(url, filename):
     """Download EPUB file from URL"""
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        os.makedirs('downloads', exist_ok=True)
-        filepath = os.path.join('downloads', filename)
-        
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
+        _ensure_downloads_dir()
+        filepath = os.path.join(DOWNLOADS_DIR, filename)
+
+        # If a local copy exists and its size matches the server's,
+        # skip the body entirely - a HEAD costs a few hundred bytes
+        # against a multi-MB EPUB
+        if not FORCE_DOWNLOAD and os.path.exists(filepath):
+            head = SESSION.head(url, allow_redirects=True, timeout=(5, 10))
+            if head.headers.get('Content-Length') == str(os.path.getsize(filepath)):
+                print(f"Already downloaded: {filepath}")
+                return filepath
+
+        # Write to a temporary name and rename into place only once the
+        # body is fully received: fallocate extends the file to its
+        # final size up front, so an aborted transfer must never be
+        # left at filepath (where it would also fool the size check
+        # above on the next run)
+        part_path = filepath + '.part'
+        try:
+            with SESSION.get(url, stream=True, timeout=(5, 60)) as response:
+                response.raise_for_status()
+
+                response.raw.decode_content = True
+                with open(part_path, 'wb') as f:
+                    # Preallocate when the final size is known, so the
+                    # filesystem lays the file out in one extent
+                    content_length = response.headers.get('Content-Length')
+                    if content_length and not response.headers.get('Content-Encoding'):
+                        try:
+                            os.posix_fallocate(f.fileno(), 0, int(content_length))
+                        except (AttributeError, OSError):
+                            pass
+                    # C-level copy loop with 1 MiB buffers instead of
+                    # per-chunk Python iteration
+                    shutil.copyfileobj(response.raw, f, length=1 << 20)
+            os.replace(part_path, filepath)
+        except Exception:
+            if os.path.exists(part_path):
+                os.unlink(part_path)
+            raise
+
         print(f"Downloaded: {filepath}")
         return filepath
-    except requests.RequestException as e:
+    except (requests.RequestException, URLLib3HTTPError) as e:
         print(f"Error downloading file: {e}")
         return None
 
@@ -73,25 +297,21 @@ def display_gutenberg_results(books):
         print("No books found on Project Gutenberg")
         return
     
-    print(f"\nProject Gutenberg Results ({len(books)} found):")
-    print("-" * 50)
-    
+    # Build the whole block and emit it with one write; per-line print
+    # calls each flush (and syscall) when stdout is unbuffered
+    lines = [f"\nProject Gutenberg Results ({len(books)} found):", "-" * 50]
+
     for i, book in enumerate(books[:10], 1):
-        title = book.get('title', 'Unknown Title')
-        authors = ', '.join([author['name'] for author in book.get('authors', [])])
-        book_id = book.get('id')
-        
-        print(f"{i}. {title}")
+        authors = ', '.join(book.authors)
+
+        lines.append(f"{i}. {book.title}")
         if authors:
-            print(f"   Author(s): {authors}")
-        print(f"   ID: {book_id}")
-        
-        formats = book.get('formats', {})
-        if 'application/epub+zip' in formats:
-            print(f"   EPUB available: Yes")
-        else:
-            print(f"   EPUB available: No")
-        print()
+            lines.append(f"   Author(s): {authors}")
+        lines.append(f"   ID: {book.id}")
+        lines.append(f"   EPUB available: {'Yes' if book.epub_url else 'No'}")
+        lines.append("")
+
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 def display_openlibrary_results(books):
     """Display Open Library search results"""
@@ -99,84 +319,126 @@ def display_openlibrary_results(books):
         print("No books found on Open Library")
         return
     
-    print(f"\nOpen Library Results ({len(books)} found):")
-    print("-" * 50)
-    
+    lines = [f"\nOpen Library Results ({len(books)} found):", "-" * 50]
+
     for i, book in enumerate(books[:10], 1):
         title = book.get('title', 'Unknown Title')
-        authors = ', '.join(book.get('author_name', []))
+        authors = ', '.join(book.get('author_name') or ())
         first_publish_year = book.get('first_publish_year', 'Unknown')
-        
-        print(f"{i}. {title}")
+
+        lines.append(f"{i}. {title}")
         if authors:
-            print(f"   Author(s): {authors}")
-        print(f"   First published: {first_publish_year}")
-        print()
+            lines.append(f"   Author(s): {authors}")
+        lines.append(f"   First published: {first_publish_year}")
+        lines.append("")
+
+    sys.stdout.write('\n'.join(lines) + '\n')
 
+@lru_cache(maxsize=256)
 def get_book_info(book_id):
     """Get book information from Project Gutenberg API"""
     try:
-        response = requests.get(f"https://gutendex.com/books/{book_id}")
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException:
+        return fetch_json(f"https://gutendex.com/books/{book_id}")
+    except (requests.RequestException, orjson.JSONDecodeError):
         return None
 
+# Characters that are invalid (or just trouble) in filenames, including
+# control characters
+_FILENAME_BAD_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
 def sanitize_filename(text):
     """Remove invalid characters from filename"""
-    import re
-    return re.sub(r'[<>:"/\\|?*]', '', text).strip()
+    return _FILENAME_BAD_CHARS.sub('', text).strip()
 
-def download_from_gutenberg(book_id):
-    """Download EPUB from Project Gutenberg by book ID"""
-    book_info = get_book_info(book_id)
-    
+def download_from_gutenberg(book_id, book_info=None):
+    """Download EPUB from Project Gutenberg by book ID
+
+    Pass book_info (a GutenbergBook from search results) when it is
+    already in hand to skip the metadata round-trip.
+    """
+    if book_info is None:
+        raw = get_book_info(book_id)
+        book_info = _to_gutenberg_book(raw) if raw else None
+
+    epub_url = None
     if book_info:
-        title = book_info.get('title', 'Unknown Title')
-        authors = book_info.get('authors', [])
-        author_name = authors[0]['name'] if authors else 'Unknown Author'
-        
+        author_name = book_info.authors[0] if book_info.authors else 'Unknown Author'
+
         # Create filename: Author - Title.epub
         safe_author = sanitize_filename(author_name)
-        safe_title = sanitize_filename(title)
+        safe_title = sanitize_filename(book_info.title)
         filename = f"{safe_author} - {safe_title}.epub"
+        epub_url = book_info.epub_url
     else:
         filename = f"gutenberg_{book_id}.epub"
-    
-    url = f"https://www.gutenberg.org/ebooks/{book_id}.epub.noimages"
+
+    # Prefer the API's own epub link (it points at the right mirror);
+    # fall back to the conventional URL when metadata is missing
+    url = epub_url or f"https://www.gutenberg.org/ebooks/{book_id}.epub.noimages"
     return download_epub(url, filename)
 
+def run_searches(title, author, source):
+    """Run the requested catalog searches concurrently and display results"""
+    gutenberg_books = []
+    openlibrary_books = []
+
+    # Both searches are independent I/O; overlapping them halves the
+    # end-to-end latency when --source all is used.
+    gutenberg_future = None
+    openlibrary_future = None
+    if source in ['gutenberg', 'all']:
+        gutenberg_future = _EXECUTOR.submit(search_project_gutenberg, title, author)
+    if source in ['openlibrary', 'all']:
+        openlibrary_future = _EXECUTOR.submit(search_open_library, title, author)
+
+    if gutenberg_future:
+        gutenberg_books = gutenberg_future.result()
+    if openlibrary_future:
+        openlibrary_books = openlibrary_future.result()
+
+    # Display in a fixed order regardless of which search finished first
+    if gutenberg_future:
+        display_gutenberg_results(gutenberg_books)
+    if openlibrary_future:
+        display_openlibrary_results(openlibrary_books)
+
+    return gutenberg_books, openlibrary_books
+
 def main():
     parser = argparse.ArgumentParser(description='Search and download books from legal sources')
     parser.add_argument('--title', '-t', help='Book title to search for')
     parser.add_argument('--author', '-a', help='Author name to search for')
     parser.add_argument('--source', choices=['gutenberg', 'openlibrary', 'all'], 
                        default='all', help='Source to search (default: all)')
-    parser.add_argument('--download', type=int, metavar='ID', 
+    parser.add_argument('--download', type=int, metavar='ID',
                        help='Download book by Project Gutenberg ID or search result index')
-    
+    parser.add_argument('--force', action='store_true',
+                       help='Re-download even if the file already exists')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Bypass the on-disk response cache')
+    parser.add_argument('--cache-ttl', type=int, metavar='SECONDS',
+                       help='Max age of cached API responses (default: 86400)')
+
     args = parser.parse_args()
+
+    global CACHE_ENABLED, CACHE_TTL, FORCE_DOWNLOAD
+    if args.no_cache:
+        CACHE_ENABLED = False
+    if args.cache_ttl is not None:
+        CACHE_TTL = args.cache_ttl
+    if args.force:
+        FORCE_DOWNLOAD = True
     
     # If download is specified with search terms, treat it as result index
     if args.download and (args.title or args.author):
-        gutenberg_books = []
-        openlibrary_books = []
-        
-        if args.source in ['gutenberg', 'all']:
-            gutenberg_books = search_project_gutenberg(args.title, args.author)
-            display_gutenberg_results(gutenberg_books)
-        
-        if args.source in ['openlibrary', 'all']:
-            openlibrary_books = search_open_library(args.title, args.author)
-            display_openlibrary_results(openlibrary_books)
-        
+        gutenberg_books, openlibrary_books = run_searches(args.title, args.author, args.source)
+
         # Try to download from the specified index
         if args.source == 'gutenberg' and gutenberg_books:
             if 1 <= args.download <= len(gutenberg_books):
                 book = gutenberg_books[args.download - 1]
-                book_id = book.get('id')
-                if book.get('formats', {}).get('application/epub+zip'):
-                    download_from_gutenberg(book_id)
+                if book.epub_url:
+                    download_from_gutenberg(book.id, book_info=book)
                 else:
                     print(f"EPUB not available for book {args.download}")
             else:
@@ -187,9 +449,8 @@ def main():
             total_books = len(gutenberg_books)
             if 1 <= args.download <= total_books:
                 book = gutenberg_books[args.download - 1]
-                book_id = book.get('id')
-                if book.get('formats', {}).get('application/epub+zip'):
-                    download_from_gutenberg(book_id)
+                if book.epub_url:
+                    download_from_gutenberg(book.id, book_info=book)
                 else:
                     print(f"EPUB not available for book {args.download}")
             else:
@@ -204,14 +465,8 @@ def main():
     if not args.title and not args.author:
         parser.error("Must specify either --title or --author (or both)")
     
-    if args.source in ['gutenberg', 'all']:
-        gutenberg_books = search_project_gutenberg(args.title, args.author)
-        display_gutenberg_results(gutenberg_books)
-    
-    if args.source in ['openlibrary', 'all']:
-        openlibrary_books = search_open_library(args.title, args.author)
-        display_openlibrary_results(openlibrary_books)
-    
+    run_searches(args.title, args.author, args.source)
+
     print("\nTo download a book:")
     print("- From search results: python books_finder.py --title 'title' --author 'author' --download <index>")
     print("- By Project Gutenberg ID: python books_finder.py --download <ID>")